@@ -1,61 +1,171 @@
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Plots are only saved to files, so no GUI backend is needed
 import matplotlib.pyplot as plt
 import os
+from pathlib import Path
 
-# Read processed exports and imports data
-exports_path = 'processed_exports.csv'
-imports_path = 'processed_imports.csv'
+# numba is optional: without it the metrics kernel below runs as plain Python
+try:
+    from numba import njit, prange
+except ImportError:
+    def njit(*args, **kwargs):
+        return lambda func: func
+    prange = range
 
-print("Reading processed data...")
-exports = pd.read_csv(exports_path)
-imports = pd.read_csv(imports_path)
+# Processed exports and imports data
+exports_path = 'processed_exports.parquet'
+imports_path = 'processed_imports.parquet'
 
-# Display data info
-print("\nExports data info:")
-print(exports.info())
-print("\nImports data info:")
-print(imports.info())
+# Computed metrics are cached and reused while they are newer than both inputs
+annual_cache_path = 'nafta_trade_metrics_annual.parquet'
+monthly_cache_path = 'nafta_trade_metrics_monthly.parquet'
 
-# Calculate trade balance (exports - imports)
-print("\nCalculating trade metrics...")
+# Row-wise trade metrics fused into a single compiled loop
+# error_model='numpy' gives inf/NaN on division by zero, matching pandas
+@njit(parallel=True, error_model='numpy', cache=True)
+def compute_metrics(exports, imports, time_code, tot_exp_by_time, tot_imp_by_time, with_rca):
+    n = exports.shape[0]
+    balance = np.empty(n, dtype=exports.dtype)
+    volume = np.empty(n, dtype=exports.dtype)
+    ratio = np.empty(n, dtype=exports.dtype)
+    rca = np.empty(n if with_rca else 0, dtype=exports.dtype)
+    for i in prange(n):
+        balance[i] = exports[i] - imports[i]
+        volume[i] = exports[i] + imports[i]
+        ratio[i] = exports[i] / imports[i]
+        # RCA = export share / import share, rearranged so the shares are never materialized
+        if with_rca:
+            t = time_code[i]
+            rca[i] = ratio[i] * (tot_imp_by_time[t] / tot_exp_by_time[t])
+    return balance, volume, ratio, rca
 
 # Create a function to merge data and calculate metrics for each time period
-def calculate_trade_metrics(exports_df, imports_df):
-    # Ensure both dataframes have same structure before merging
-    exports_df = exports_df[['Time', 'Date', 'Year', 'Month', 'Country', 'Value ($US)']]
-    imports_df = imports_df[['Time', 'Date', 'Year', 'Month', 'Country', 'Value ($US)']]
+def calculate_trade_metrics(exports_df, imports_df, with_rca=False):
+    # Encode each row's Time and Country as one int64 key, using the values observed on
+    # either side as shared categories, so the outer join runs on a single integer column
+    keys = ['Time', 'Date', 'Year', 'Month', 'Country']
+    all_rows = pd.concat([exports_df[keys], imports_df[keys]])
+    time_cats = pd.Index(all_rows['Time'].astype(str).unique()).sort_values()
+    country_cats = pd.Index(all_rows['Country'].astype(str).unique()).sort_values()
+    n_countries = len(country_cats)
     
-    # Rename columns to distinguish exports and imports
-    exports_df = exports_df.rename(columns={'Value ($US)': 'Exports'})
-    imports_df = imports_df.rename(columns={'Value ($US)': 'Imports'})
+    def trade_key(df):
+        time_code = time_cats.get_indexer(df['Time'].astype(str)).astype(np.int64)
+        country_code = country_cats.get_indexer(df['Country'].astype(str))
+        return time_code * n_countries + country_code
     
-    # Merge datasets on common fields
-    merged = pd.merge(exports_df, imports_df, on=['Time', 'Date', 'Year', 'Month', 'Country'], how='outer')
+    exports_k = pd.DataFrame({'key': trade_key(exports_df), 'Exports': exports_df['Value ($US)'].to_numpy()})
+    imports_k = pd.DataFrame({'key': trade_key(imports_df), 'Imports': imports_df['Value ($US)'].to_numpy()})
     
-    # Calculate trade metrics
-    merged['Trade_Balance'] = merged['Exports'] - merged['Imports']
-    merged['Trade_Volume'] = merged['Exports'] + merged['Imports']
-    merged['Export_Import_Ratio'] = merged['Exports'] / merged['Imports']
+    # validate raises on duplicate keys, which would silently multiply rows in the outer join
+    merged = pd.merge(exports_k, imports_k, on='key', how='outer', validate='one_to_one')
+    
+    # Decode the key back into Time and Country; Date, Year and Month depend only on Time
+    time_code = merged['key'].to_numpy() // n_countries
+    per_time = all_rows.drop_duplicates('Time')
+    per_time = per_time.set_index(per_time['Time'].astype(str)).reindex(time_cats)
+    merged = pd.DataFrame({
+        'Time': pd.Categorical.from_codes(time_code, categories=time_cats),
+        'Date': per_time['Date'].to_numpy()[time_code],
+        'Year': per_time['Year'].to_numpy()[time_code],
+        'Month': per_time['Month'].to_numpy()[time_code],
+        'Country': pd.Categorical.from_codes(merged['key'].to_numpy() % n_countries, categories=country_cats),
+        'Exports': merged['Exports'],
+        'Imports': merged['Imports'],
+    })
+    
+    # Categorical keys let the groupby below work on integer codes instead of strings
+    for col in ['Time', 'Country', 'Month', 'Year']:
+        merged[col] = merged[col].astype('category')
     
     # Calculate Revealed Comparative Advantage Index (simplified version)
     # For detailed RCA, we would need product-level data
-    merged['Export_Share'] = merged['Exports'] / merged.groupby('Time')['Exports'].transform('sum')
-    merged['Import_Share'] = merged['Imports'] / merged.groupby('Time')['Imports'].transform('sum')
-    merged['RCA_Index'] = merged['Export_Share'] / merged['Import_Share']
+    # Only the annual rows are analysed, so callers ask for RCA on that partition alone
+    exports_arr = merged['Exports'].to_numpy()
+    imports_arr = merged['Imports'].to_numpy()
+    time_code = merged['Time'].cat.codes.to_numpy().astype(np.intp)
+    
+    if with_rca:
+        # Per-period totals for both flows (NaN counts as 0, like sum)
+        n_times = len(merged['Time'].cat.categories)
+        tot_exp_by_time = np.bincount(time_code, weights=np.nan_to_num(exports_arr),
+                                      minlength=n_times).astype(exports_arr.dtype)
+        tot_imp_by_time = np.bincount(time_code, weights=np.nan_to_num(imports_arr),
+                                      minlength=n_times).astype(imports_arr.dtype)
+    else:
+        tot_exp_by_time = tot_imp_by_time = np.empty(0, dtype=exports_arr.dtype)
+    
+    # Calculate trade metrics in one fused pass over the rows
+    balance, volume, ratio, rca = compute_metrics(
+        exports_arr, imports_arr, time_code, tot_exp_by_time, tot_imp_by_time, with_rca)
+    merged['Trade_Balance'] = balance
+    merged['Trade_Volume'] = volume
+    merged['Export_Import_Ratio'] = ratio
+    if with_rca:
+        merged['RCA_Index'] = rca
     
     return merged
 
-# Calculate metrics
-trade_metrics = calculate_trade_metrics(exports, imports)
+# Skip the merge and metric computation when the cached results are up to date
+caches = [Path(annual_cache_path), Path(monthly_cache_path)]
+sources = [Path(exports_path), Path(imports_path)]
+caches_exist = all(c.exists() for c in caches)
+missing_sources = [str(s) for s in sources if not s.exists()]
+
+# Without inputs the cache is the only thing left to use; without either, nothing can run
+if missing_sources and not caches_exist:
+    raise FileNotFoundError(f"Missing {', '.join(missing_sources)}; "
+                            "run nafta-exports.py and nafta-imports.py first")
+cache_is_fresh = caches_exist and (
+    bool(missing_sources)
+    or min(c.stat().st_mtime for c in caches) >= max(s.stat().st_mtime for s in sources))
+
+if cache_is_fresh:
+    if missing_sources:
+        print(f"Missing {', '.join(missing_sources)}, reading cached trade metrics...")
+    else:
+        print("Inputs unchanged, reading cached trade metrics...")
+    annual_metrics = pd.read_parquet(annual_cache_path)
+    monthly_metrics = pd.read_parquet(monthly_cache_path)
+else:
+    # Read processed exports and imports data
+    print("Reading processed data...")
+    exports = pd.read_parquet(exports_path)
+    imports = pd.read_parquet(imports_path)
+
+    # Display data info
+    print("\nExports data info:")
+    print(exports.info())
+    print("\nImports data info:")
+    print(imports.info())
 
-# Display results
-print("\nTrade metrics sample:")
-print(trade_metrics.head())
+    # Calculate trade balance (exports - imports)
+    print("\nCalculating trade metrics...")
 
-# Save results
-trade_metrics.to_csv('nafta_trade_metrics.csv', index=False)
-print("\nTrade metrics saved to nafta_trade_metrics.csv")
+    # Calculate metrics separately for annual and monthly rows (Month_Num == 0 is annual)
+    # so the annual analysis never has to filter monthly rows back out
+    annual_metrics = calculate_trade_metrics(exports.loc[exports['Month_Num'] == 0],
+                                             imports.loc[imports['Month_Num'] == 0], with_rca=True)
+    monthly_metrics = calculate_trade_metrics(exports.loc[exports['Month_Num'] != 0],
+                                              imports.loc[imports['Month_Num'] != 0])
+
+    # Display results
+    print("\nAnnual trade metrics sample:")
+    print(annual_metrics.head())
+    print("\nMonthly trade metrics sample:")
+    print(monthly_metrics.head())
+
+    # Save results
+    # Metrics are float32, so more digits than this would only print rounding noise
+    annual_metrics.to_csv('nafta_trade_metrics_annual.csv', index=False, float_format='%.7g')
+    monthly_metrics.to_csv('nafta_trade_metrics_monthly.csv', index=False, float_format='%.7g')
+    print("\nTrade metrics saved to nafta_trade_metrics_annual.csv and nafta_trade_metrics_monthly.csv")
+
+    # Cache the metrics with their dtypes for the next run
+    annual_metrics.to_parquet(annual_cache_path, index=False)
+    monthly_metrics.to_parquet(monthly_cache_path, index=False)
 
 # Create visualizations
 print("\nGenerating visualizations...")
@@ -63,47 +173,44 @@ print("\nGenerating visualizations...")
 # Create a directory for plots if it doesn't exist
 os.makedirs('plots', exist_ok=True)
 
-# 1. Annual trade balance by country
-annual_data = trade_metrics[trade_metrics['Month'] == 'Annual']
-plt.figure(figsize=(12, 6))
-for country in annual_data['Country'].unique():
-    country_data = annual_data[annual_data['Country'] == country]
-    plt.plot(country_data['Year'], country_data['Trade_Balance'] / 1e9, 
-             marker='o', label=country)
-plt.title('Annual Trade Balance by Country')
-plt.xlabel('Year')
-plt.ylabel('Trade Balance (Billion USD)')
-plt.grid(True, linestyle='--', alpha=0.7)
-plt.legend()
-plt.savefig('plots/annual_trade_balance.png')
-
-# 2. Export-Import Ratio over time
-plt.figure(figsize=(12, 6))
-for country in annual_data['Country'].unique():
-    country_data = annual_data[annual_data['Country'] == country]
-    plt.plot(country_data['Year'], country_data['Export_Import_Ratio'], 
-             marker='o', label=country)
-plt.axhline(y=1, color='r', linestyle='-', alpha=0.5, label='Balance point (Exports = Imports)')
-plt.title('Export-Import Ratio by Country (Values > 1 indicate trade surplus)')
-plt.xlabel('Year')
-plt.ylabel('Export/Import Ratio')
-plt.grid(True, linestyle='--', alpha=0.7)
-plt.legend()
-plt.savefig('plots/export_import_ratio.png')
-
-# 3. Revealed Comparative Advantage Index
-plt.figure(figsize=(12, 6))
-for country in annual_data['Country'].unique():
-    country_data = annual_data[annual_data['Country'] == country]
-    plt.plot(country_data['Year'], country_data['RCA_Index'], 
-             marker='o', label=country)
-plt.axhline(y=1, color='r', linestyle='-', alpha=0.5, label='Neutral advantage')
-plt.title('Revealed Comparative Advantage Index by Country')
-plt.xlabel('Year')
-plt.ylabel('RCA Index (>1 indicates comparative advantage)')
-plt.grid(True, linestyle='--', alpha=0.7)
-plt.legend()
-plt.savefig('plots/rca_index.png')
+# Pivot once to one column per country so each figure plots without per-country filtering
+annual_by_country = annual_metrics.set_index(['Year', 'Country'])[
+    ['Trade_Balance', 'Export_Import_Ratio', 'RCA_Index']].unstack('Country')
+
+# Shared style for all three figures
+plot_style = {'figure.figsize': (12, 6), 'axes.grid': True, 'grid.linestyle': '--', 'grid.alpha': 0.7}
+with plt.rc_context(plot_style):
+    # 1. Annual trade balance by country
+    fig, ax = plt.subplots()
+    (annual_by_country['Trade_Balance'] / 1e9).plot(ax=ax, marker='o')
+    ax.set_title('Annual Trade Balance by Country')
+    ax.set_xlabel('Year')
+    ax.set_ylabel('Trade Balance (Billion USD)')
+    ax.legend()
+    fig.savefig('plots/annual_trade_balance.png')
+    plt.close(fig)
+
+    # 2. Export-Import Ratio over time
+    fig, ax = plt.subplots()
+    annual_by_country['Export_Import_Ratio'].plot(ax=ax, marker='o')
+    ax.axhline(y=1, color='r', linestyle='-', alpha=0.5, label='Balance point (Exports = Imports)')
+    ax.set_title('Export-Import Ratio by Country (Values > 1 indicate trade surplus)')
+    ax.set_xlabel('Year')
+    ax.set_ylabel('Export/Import Ratio')
+    ax.legend()
+    fig.savefig('plots/export_import_ratio.png')
+    plt.close(fig)
+
+    # 3. Revealed Comparative Advantage Index
+    fig, ax = plt.subplots()
+    annual_by_country['RCA_Index'].plot(ax=ax, marker='o')
+    ax.axhline(y=1, color='r', linestyle='-', alpha=0.5, label='Neutral advantage')
+    ax.set_title('Revealed Comparative Advantage Index by Country')
+    ax.set_xlabel('Year')
+    ax.set_ylabel('RCA Index (>1 indicates comparative advantage)')
+    ax.legend()
+    fig.savefig('plots/rca_index.png')
+    plt.close(fig)
 
 print("\nVisualizations saved to the 'plots' directory")
 print("\nAnalysis complete!")
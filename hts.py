@@ -7,11 +7,23 @@ US trade dependencies and strategic import patterns that drive trade imbalances.
 
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Figures are only saved to files, so no GUI backend is needed
 import matplotlib.pyplot as plt
 import seaborn as sns
+from functools import lru_cache
+from pathlib import Path
 
+# All generated files go here; create it up front so every writer can assume it exists
+OUTPUT_DIR = Path('/tmp/outputs')
+OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+@lru_cache(maxsize=1)
 def define_strategic_hts_codes():
-    """Define HTS codes by strategic importance categories."""
+    """Define HTS codes by strategic importance categories.
+    
+    The result is cached and shared between callers, so treat it as read-only.
+    """
     
     strategic_codes = {
         "SEMICONDUCTORS & ELECTRONICS": {
@@ -143,25 +155,44 @@ def define_strategic_hts_codes():
     
     return strategic_codes
 
-def create_hts_priority_matrix():
-    """Create visualization showing HTS code priorities."""
+# Scores used to place each category on the priority matrix
+IMPACT_MAPPING = {"High": 3, "Medium-High": 2.5, "Medium": 2, "Low-Medium": 1.5, "Low": 1}
+DEPENDENCY_MAPPING = {"Critical": 3, "High": 2.5, "Medium-High": 2, "Medium": 1.5, "Low-Medium": 1.25, "Low": 1}
+
+def build_hts_code_table(strategic_codes):
+    """Flatten the strategic code definitions into one row per HTS code."""
     
-    strategic_codes = define_strategic_hts_codes()
+    # Build from flat tuples rather than one dict per code
+    rows = [
+        (code, description, category, info["trade_impact"], info["dependency_level"], info["description"])
+        for category, info in strategic_codes.items()
+        for code, description in info["codes"].items()
+    ]
     
-    # Create dataframe for analysis
-    categories = []
-    trade_impacts = []
-    dependency_levels = []
-    code_counts = []
+    return pd.DataFrame.from_records(
+        rows,
+        columns=['HTS_Code', 'Description', 'Category', 'Trade_Impact', 'Dependency_Level', 'Strategic_Note']
+    )
+
+def build_category_summary(strategic_codes, impact_mapping=IMPACT_MAPPING, dependency_mapping=DEPENDENCY_MAPPING):
+    """Score each strategic category by trade impact, dependency and code count."""
     
-    impact_mapping = {"High": 3, "Medium-High": 2.5, "Medium": 2, "Low-Medium": 1.5, "Low": 1}
-    dependency_mapping = {"Critical": 3, "High": 2.5, "Medium-High": 2, "Medium": 1.5, "Low": 1}
+    rows = [
+        (category,
+         impact_mapping[info["trade_impact"].split(" - ")[0]],
+         dependency_mapping[info["dependency_level"]],
+         len(info["codes"]))
+        for category, info in strategic_codes.items()
+    ]
     
-    for category, info in strategic_codes.items():
-        categories.append(category)
-        trade_impacts.append(impact_mapping[info["trade_impact"].split(" - ")[0]])
-        dependency_levels.append(dependency_mapping[info["dependency_level"]])
-        code_counts.append(len(info["codes"]))
+    return pd.DataFrame.from_records(rows, columns=['category', 'trade_impact', 'dependency', 'code_count'])
+
+def create_hts_priority_matrix(summary):
+    """Create visualization showing HTS code priorities."""
+    
+    # Convert once so the colormap works on an array, not a list
+    impact_scores = summary['trade_impact'].to_numpy(dtype=np.float32)
+    colors = plt.cm.RdYlBu_r(impact_scores / 3.0)
     
     # Create visualization
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20, 8))
@@ -169,14 +200,15 @@ def create_hts_priority_matrix():
                  fontsize=16, fontweight='bold')
     
     # Priority scatter plot
-    scatter = ax1.scatter(trade_impacts, dependency_levels, 
-                         s=[x*50 for x in code_counts], 
-                         c=trade_impacts, cmap='RdYlBu_r', alpha=0.7)
+    scatter = ax1.scatter(summary['trade_impact'], summary['dependency'], 
+                         s=summary['code_count'] * 50, 
+                         c=summary['trade_impact'], cmap='RdYlBu_r', alpha=0.7)
     
-    # Add category labels
-    for i, cat in enumerate(categories):
-        ax1.annotate(cat.replace(" & ", " &\n"), 
-                    (trade_impacts[i], dependency_levels[i]), 
+    # Add category labels, wrapped once up front
+    labels = summary['category'].str.replace(" & ", " &\n", regex=False)
+    for label, x, y in zip(labels, summary['trade_impact'], summary['dependency']):
+        ax1.annotate(label, 
+                    (x, y), 
                     xytext=(5, 5), textcoords='offset points', 
                     fontsize=9, fontweight='bold')
     
@@ -198,23 +230,20 @@ def create_hts_priority_matrix():
              bbox=dict(boxstyle='round', facecolor='lightgreen', alpha=0.7))
     
     # Code count by category
-    ax2.barh(categories, code_counts, color=plt.cm.RdYlBu_r([x/3 for x in trade_impacts]))
+    bars = ax2.barh(summary['category'], summary['code_count'], color=colors)
     ax2.set_xlabel('Number of Key HTS Codes', fontweight='bold')
     ax2.set_title('HTS Code Coverage by Strategic Category', fontweight='bold')
     
     # Add value labels
-    for i, count in enumerate(code_counts):
-        ax2.text(count + 0.1, i, str(count), va='center', fontweight='bold')
+    ax2.bar_label(bars, labels=summary['code_count'].astype(str).tolist(), padding=3, fontweight='bold')
     
     plt.tight_layout()
-    plt.savefig('/tmp/outputs/strategic_hts_priority_matrix.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    fig.savefig(OUTPUT_DIR / 'strategic_hts_priority_matrix.png', dpi=300, bbox_inches='tight')
+    plt.close(fig)
 
-def create_implementation_guide():
+def create_implementation_guide(strategic_codes):
     """Create detailed implementation guide for HTS code analysis."""
     
-    strategic_codes = define_strategic_hts_codes()
-    
     guide = """# Strategic HTS Codes Implementation Guide
 
 ## 🎯 **Recommended Implementation Priority**
@@ -436,34 +465,20 @@ strategic_dependency = {
 *Goal: Show which deficits are choices vs. necessities*
 """
     
-    with open('/tmp/outputs/hts_implementation_guide.md', 'w') as f:
+    # Large buffer so the whole guide goes out in a single write
+    guide_path = OUTPUT_DIR / 'hts_implementation_guide.md'
+    with open(guide_path, 'w', buffering=1 << 20) as f:
         f.write(guide)
     
     print("📋 Implementation Guide Generated")
-    print("💾 Saved to: /tmp/outputs/hts_implementation_guide.md")
+    print(f"💾 Saved to: {guide_path}")
 
-def create_hts_code_reference():
+def create_hts_code_reference(reference_df, strategic_codes):
     """Create a comprehensive HTS code reference sheet."""
     
-    strategic_codes = define_strategic_hts_codes()
-    
-    # Create reference dataframe
-    reference_data = []
-    for category, info in strategic_codes.items():
-        for code, description in info["codes"].items():
-            reference_data.append({
-                'HTS_Code': code,
-                'Description': description,
-                'Category': category,
-                'Trade_Impact': info["trade_impact"],
-                'Dependency_Level': info["dependency_level"],
-                'Strategic_Note': info["description"]
-            })
-    
-    reference_df = pd.DataFrame(reference_data)
-    
     # Save as CSV for easy reference
-    reference_df.to_csv('/tmp/outputs/strategic_hts_codes_reference.csv', index=False)
+    reference_path = OUTPUT_DIR / 'strategic_hts_codes_reference.csv'
+    reference_df.to_csv(reference_path, index=False)
     
     # Create summary table by category
     print("\n" + "="*80)
@@ -484,8 +499,8 @@ def create_hts_code_reference():
         if len(info['codes']) > 3:
             print(f"     ... and {len(info['codes'])-3} more")
     
-    print(f"\n📊 Total Strategic HTS Codes: {len(reference_data)}")
-    print(f"💾 Reference saved to: /tmp/outputs/strategic_hts_codes_reference.csv")
+    print(f"\n📊 Total Strategic HTS Codes: {len(reference_df)}")
+    print(f"💾 Reference saved to: {reference_path}")
 
 def main():
     """Generate comprehensive HTS code analysis guide."""
@@ -493,16 +508,21 @@ def main():
     print("🔍 STRATEGIC HTS CODES ANALYSIS")
     print("=" * 50)
     
+    # Build the code definitions and their derived tables once for all outputs
+    strategic_codes = define_strategic_hts_codes()
+    reference_df = build_hts_code_table(strategic_codes)
+    summary = build_category_summary(strategic_codes)
+    
     # Create HTS code definitions and reference
-    create_hts_code_reference()
+    create_hts_code_reference(reference_df, strategic_codes)
     
     # Create priority visualization
     print("\n📈 Creating priority matrix visualization...")
-    create_hts_priority_matrix()
+    create_hts_priority_matrix(summary)
     
     # Create implementation guide  
     print("\n📋 Generating implementation guide...")
-    create_implementation_guide()
+    create_implementation_guide(strategic_codes)
     
     print("\n✅ HTS ANALYSIS COMPLETE")
     print("\n📊 Files Generated:")
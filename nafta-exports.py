@@ -1,14 +1,16 @@
 import pandas as pd
-import numpy as np
 import os
 
 # Set path for input and output
 input_path = 'csv files/Standard Report - Exports.csv'
-output_path = 'processed_exports.csv'
+output_path = 'processed_exports.parquet'
 
 # Read the CSV file
 print("Reading exports data...")
-exports = pd.read_csv(input_path)
+# Parse thousands separators and dtypes in the reader instead of cleaning strings afterwards
+# float32 holds these trade values to ~7 significant digits at half the memory
+exports = pd.read_csv(input_path, usecols=['Time', 'Country', 'Value ($US)'], thousands=',',
+                      dtype={'Value ($US)': 'float32', 'Country': 'category'})
 
 # Display original data info
 print("\nOriginal data info:")
@@ -16,35 +18,30 @@ print(exports.info())
 print("\nOriginal data sample:")
 print(exports.head())
 
-# Clean the Value column: remove commas and convert to float
-print("\nCleaning Value column...")
-exports['Value ($US)'] = exports['Value ($US)'].str.replace(',','').astype(float)
+# Parse the Time column once; annual rows ("2012", "2025 through March") become NaT
+dt = pd.to_datetime(exports['Time'], format='%B %Y', errors='coerce')
 
 # Create Year and Month columns for better analysis
-exports['Year'] = exports['Time'].str.extract(r'(\d{4})').fillna(exports['Time'])
-exports['Month'] = exports['Time'].str.extract(r'(\w+)\s+\d{4}').fillna('Annual')
-
-# Keep the original Time column but also create separate columns for analytical purposes
-# Extract month number for better sorting
-month_map = {
-    'January': '01', 'February': '02', 'March': '03', 'April': '04',
-    'May': '05', 'June': '06', 'July': '07', 'August': '08',
-    'September': '09', 'October': '10', 'November': '11', 'December': '12',
-    'Annual': '00'  # Special case for annual data
-}
-exports['Month_Num'] = exports['Month'].map(month_map)
+exports['Year'] = (dt.dt.year.astype('Int16')
+                   .fillna(exports.loc[dt.isna(), 'Time'].str[:4].astype('Int16'))
+                   .astype('int16'))
+exports['Month'] = dt.dt.month_name().fillna('Annual')
+
+# Extract month number for better sorting (0 for annual data)
+exports['Month_Num'] = dt.dt.month.fillna(0).astype('int8')
 
 # Create a proper date column for time series analysis
-exports['Date'] = np.where(
-    exports['Month'] == 'Annual',
-    exports['Year'],  # Use just the year for annual values
-    exports['Year'] + '-' + exports['Month_Num'] + '-01'  # Create a date at the start of the month
-)
+# Annual values have no single date and stay NaT; Month_Num == 0 marks them
+exports['Date'] = dt
 
 # Reorder columns in a logical way
 column_order = ['Time', 'Date', 'Year', 'Month', 'Month_Num', 'Country', 'Value ($US)']
 exports = exports[column_order]
 
+# Store the repeated string keys as categoricals for the downstream merge and groupby
+for col in ['Time', 'Month']:
+    exports[col] = exports[col].astype('category')
+
 # Display cleaned data
 print("\nCleaned data info:")
 print(exports.info())
@@ -52,5 +49,6 @@ print("\nCleaned data sample:")
 print(exports.head())
 
 # Save the processed data
-exports.to_csv(output_path, index=False)
+# Parquet keeps the categorical and datetime dtypes for combined.py
+exports.to_parquet(output_path, engine='pyarrow', compression='zstd', index=False)
 print(f"\nProcessed data saved to {output_path}")